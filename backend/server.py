@@ -1,14 +1,33 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, ReplaceOne
 from pydantic import BaseModel
 from typing import Optional, List
 import os
+import re
+import logging
 import uuid
 import base64
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 import mimetypes
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import pikepdf
+except ImportError:  # PDF optimization is optional
+    pikepdf = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Thumbnails are optional
+    pdfium = None
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -25,6 +44,33 @@ client = MongoClient(os.environ.get('MONGO_URL'))
 db = client.pdf_management
 folders_collection = db.folders
 files_collection = db.files
+jobs_collection = db.jobs
+thumbnails_collection = db.thumbnails
+search_collection = db.file_search
+
+# Soft delete / blob garbage collection settings
+DELETED_RETENTION_SECONDS = int(os.environ.get('DELETED_RETENTION_SECONDS', 7 * 24 * 3600))
+GC_INTERVAL_SECONDS = int(os.environ.get('GC_INTERVAL_SECONDS', 60))
+GC_BATCH_SIZE = int(os.environ.get('GC_BATCH_SIZE', 100))
+GC_BATCH_PAUSE_SECONDS = float(os.environ.get('GC_BATCH_PAUSE_SECONDS', 0.5))
+
+# Background PDF optimization settings
+PDF_OPTIMIZE_ENABLED = os.environ.get('PDF_OPTIMIZE_ENABLED', 'false').lower() == 'true' and pikepdf is not None
+PDF_METADATA_ENABLED = os.environ.get('PDF_METADATA_ENABLED', 'true').lower() == 'true' and pikepdf is not None
+THUMBNAIL_WIDTH = int(os.environ.get('THUMBNAIL_WIDTH', 200))
+METADATA_BACKFILL_BATCH_SIZE = int(os.environ.get('METADATA_BACKFILL_BATCH_SIZE', 50))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS', 2))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+
+# File-name search settings
+SEARCH_NGRAM_SIZE = 3
+SEARCH_BACKFILL_BATCH_SIZE = int(os.environ.get('SEARCH_BACKFILL_BATCH_SIZE', 1000))
+SEARCH_GRAM_PROBE_LIMIT = int(os.environ.get('SEARCH_GRAM_PROBE_LIMIT', 1000))
+SEARCH_MAX_GRAM_PROBES = int(os.environ.get('SEARCH_MAX_GRAM_PROBES', 4))
+
+# Matches documents that have not been tombstoned (field missing or null)
+NOT_DELETED = {"deleted_at": None}
 
 # Pydantic models
 class FolderCreate(BaseModel):
@@ -50,13 +96,486 @@ class FileInfo(BaseModel):
     folder_id: Optional[str] = None
     size: int
     uploaded_at: datetime
+    page_count: Optional[int] = None
+    pdf_version: Optional[str] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    encrypted: Optional[bool] = None
+    has_thumbnail: bool = False
+
+def file_info(file_doc) -> FileInfo:
+    return FileInfo(
+        id=file_doc["_id"],
+        name=file_doc["name"],
+        folder_id=file_doc.get("folder_id"),
+        size=file_doc["size"],
+        uploaded_at=file_doc["uploaded_at"],
+        page_count=file_doc.get("page_count"),
+        pdf_version=file_doc.get("pdf_version"),
+        title=file_doc.get("title"),
+        author=file_doc.get("author"),
+        encrypted=file_doc.get("encrypted"),
+        has_thumbnail=file_doc.get("has_thumbnail", False)
+    )
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+def name_ngrams(normalized: str) -> List[str]:
+    return sorted({
+        normalized[i:i + SEARCH_NGRAM_SIZE]
+        for i in range(len(normalized) - SEARCH_NGRAM_SIZE + 1)
+    })
+
+def search_entry(file_doc):
+    normalized = normalize_name(file_doc["name"])
+    return {
+        "_id": file_doc["_id"],
+        "name_lower": normalized,
+        "grams": name_ngrams(normalized),
+        "folder_id": file_doc.get("folder_id")
+    }
+
+def index_file(file_doc):
+    """Add or refresh a file's entry in the name search index"""
+    search_collection.replace_one({"_id": file_doc["_id"]}, search_entry(file_doc), upsert=True)
+
+def probe_grams(normalized: str) -> List[str]:
+    """Choose a few query grams, spread across the query, to probe for selectivity
+
+    Grams with punctuation or spaces (".pd", " 20") match most of a PDF
+    library, so they are only used when nothing else is available.
+    """
+    grams = list(dict.fromkeys(
+        normalized[i:i + SEARCH_NGRAM_SIZE]
+        for i in range(len(normalized) - SEARCH_NGRAM_SIZE + 1)
+    ))
+    candidates = [gram for gram in grams if gram.isalnum()] or grams
+    if len(candidates) <= SEARCH_MAX_GRAM_PROBES:
+        return candidates
+    step = (len(candidates) - 1) / max(SEARCH_MAX_GRAM_PROBES - 1, 1)
+    return [candidates[round(i * step)] for i in range(SEARCH_MAX_GRAM_PROBES)]
+
+def most_selective_gram(normalized: str) -> Optional[tuple]:
+    """Pick the probed gram matching the fewest indexed names, with its capped count"""
+    best = None
+    for gram in probe_grams(normalized):
+        # Capped counts keep the probe cheap even for very common grams
+        count = search_collection.count_documents({"grams": gram}, limit=SEARCH_GRAM_PROBE_LIMIT)
+        if best is None or count < best[1]:
+            best = (gram, count)
+    return best
+
+def build_search_query(normalized: str, folder_id: Optional[str], match: str):
+    """Return the index query and optional index hint for a name search"""
+    query = {}
+    hint = None
+    if folder_id is not None:
+        query["folder_id"] = folder_id
+    # Substrings shorter than a gram have no index keys, so treat them as typeahead
+    if match == "prefix" or len(normalized) < SEARCH_NGRAM_SIZE:
+        # Anchored regex is answered from the name_lower index bounds
+        query["name_lower"] = {"$regex": "^" + re.escape(normalized)}
+    else:
+        best = most_selective_gram(normalized)
+        if best is not None:
+            # Narrow candidates with the n-gram index, then confirm the substring
+            query["grams"] = best[0]
+            if best[1] < SEARCH_GRAM_PROBE_LIMIT:
+                hint = [("grams", 1)]
+        query["name_lower"] = {"$regex": re.escape(normalized)}
+    return query, hint
+
+def unindex_files(file_ids: List[str]):
+    search_collection.delete_many({"_id": {"$in": file_ids}})
+
+def backfill_search_batch() -> int:
+    """Index one batch of files that are missing from the search index"""
+    batch = list(files_collection.find(
+        {"search_indexed": None, **NOT_DELETED}, {"name": 1, "folder_id": 1}
+    ).limit(SEARCH_BACKFILL_BATCH_SIZE))
+    if not batch:
+        return 0
+    search_collection.bulk_write(
+        [ReplaceOne({"_id": file_doc["_id"]}, search_entry(file_doc), upsert=True) for file_doc in batch],
+        ordered=False
+    )
+    files_collection.update_many(
+        {"_id": {"$in": [file_doc["_id"] for file_doc in batch]}},
+        {"$set": {"search_indexed": True}}
+    )
+    return len(batch)
+
+async def search_backfill():
+    """Index files uploaded before the search index existed"""
+    while True:
+        try:
+            if await run_in_threadpool(backfill_search_batch) == 0:
+                return
+        except Exception:
+            logger.exception("Search backfill failed")
+        await asyncio.sleep(GC_BATCH_PAUSE_SECONDS)
+
+@app.on_event("startup")
+async def start_search_index():
+    search_collection.create_index([("name_lower", 1), ("_id", 1)])
+    search_collection.create_index([("folder_id", 1), ("name_lower", 1), ("_id", 1)])
+    search_collection.create_index("grams")
+    files_collection.create_index("search_indexed")
+    app.state.search_backfill_task = asyncio.create_task(search_backfill())
+
+@app.on_event("shutdown")
+async def stop_search_index():
+    app.state.search_backfill_task.cancel()
+
+def purge_deleted_batch(collection, cutoff):
+    """Hard-delete one batch of tombstoned documents older than cutoff"""
+    ids = [
+        doc["_id"] for doc in collection.find(
+            {"deleted_at": {"$ne": None, "$lt": cutoff}}, {"_id": 1}
+        ).limit(GC_BATCH_SIZE)
+    ]
+    if not ids:
+        return 0
+    deleted = collection.delete_many(
+        {"_id": {"$in": ids}, "deleted_at": {"$ne": None, "$lt": cutoff}}
+    ).deleted_count
+    if collection is files_collection:
+        # Skip files restored between the find and the delete
+        restored = set(files_collection.distinct("_id", {"_id": {"$in": ids}}))
+        thumbnails_collection.delete_many({"_id": {"$in": [i for i in ids if i not in restored]}})
+    return deleted
+
+async def garbage_collector():
+    """Reclaim tombstoned files and folders once the retention window has passed"""
+    while True:
+        try:
+            cutoff = datetime.now() - timedelta(seconds=DELETED_RETENTION_SECONDS)
+            for collection in (files_collection, folders_collection):
+                # Small batches with a pause in between keep load on the primary low
+                while await run_in_threadpool(purge_deleted_batch, collection, cutoff) == GC_BATCH_SIZE:
+                    await asyncio.sleep(GC_BATCH_PAUSE_SECONDS)
+        except Exception:
+            logger.exception("Garbage collection failed")
+        await asyncio.sleep(GC_INTERVAL_SECONDS)
+
+def parent_folder_missing(folder_id: Optional[str]) -> bool:
+    """True if an item placed in this folder would be unreachable"""
+    if folder_id is None:
+        return False
+    return folders_collection.find_one({"_id": folder_id, **NOT_DELETED}, {"_id": 1}) is None
+
+@app.on_event("startup")
+async def start_garbage_collector():
+    files_collection.create_index("folder_id")
+    files_collection.create_index("deleted_at")
+    files_collection.create_index("deleted_with")
+    folders_collection.create_index("deleted_at")
+    folders_collection.create_index("deleted_with")
+    app.state.gc_task = asyncio.create_task(garbage_collector())
+
+@app.on_event("shutdown")
+async def stop_garbage_collector():
+    app.state.gc_task.cancel()
+
+def optimize_pdf(content: bytes) -> Optional[bytes]:
+    """Linearize and recompress a PDF, returning None if the result is not usable
+
+    Runs inside the process pool, so it must stay a plain module-level function.
+    """
+    with pikepdf.open(BytesIO(content)) as pdf:
+        # Saving would silently strip owner-password restrictions
+        if pdf.is_encrypted:
+            return None
+        page_count = len(pdf.pages)
+        output = BytesIO()
+        pdf.save(
+            output,
+            linearize=True,
+            compress_streams=True,
+            recompress_flate=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate
+        )
+    optimized = output.getvalue()
+    if len(optimized) >= len(content):
+        return None
+    # Make sure the rewritten file still opens and has every page
+    with pikepdf.open(BytesIO(optimized)) as pdf:
+        if len(pdf.pages) != page_count:
+            return None
+    return optimized
+
+def render_thumbnail(content: bytes) -> bytes:
+    """Render the first page as a small JPEG"""
+    document = pdfium.PdfDocument(content)
+    try:
+        page = document[0]
+        image = page.render(scale=THUMBNAIL_WIDTH / page.get_width()).to_pil()
+    finally:
+        document.close()
+    output = BytesIO()
+    image.convert("RGB").save(output, "JPEG", quality=80)
+    return output.getvalue()
+
+def extract_pdf_metadata(content: bytes):
+    """Parse a PDF once, returning its metadata and an optional thumbnail
+
+    Runs inside the process pool, so it must stay a plain module-level function.
+    """
+    try:
+        pdf = pikepdf.open(BytesIO(content))
+    except pikepdf.PasswordError:
+        # Needs a user password, so nothing else can be read
+        return {"encrypted": True}, None
+
+    with pdf:
+        docinfo = pdf.docinfo
+        metadata = {
+            "page_count": len(pdf.pages),
+            "pdf_version": pdf.pdf_version,
+            "title": str(docinfo["/Title"]) if "/Title" in docinfo else None,
+            "author": str(docinfo["/Author"]) if "/Author" in docinfo else None,
+            "encrypted": pdf.is_encrypted
+        }
+
+    thumbnail = None
+    if pdfium is not None and metadata["page_count"]:
+        try:
+            thumbnail = render_thumbnail(content)
+        except Exception:
+            # A preview is optional; keep the metadata pikepdf already read
+            thumbnail = None
+    return metadata, thumbnail
+
+def enqueue_job(kind: str, file_id: str) -> str:
+    """Queue a background job for a file"""
+    job_id = str(uuid.uuid4())
+    jobs_collection.insert_one({
+        "_id": job_id,
+        "kind": kind,
+        "file_id": file_id,
+        "status": "queued",
+        "created_at": datetime.now()
+    })
+    return job_id
+
+def claim_job(kind: str):
+    """Atomically take the oldest queued job of the given kind"""
+    return jobs_collection.find_one_and_update(
+        {"kind": kind, "status": "queued"},
+        {"$set": {"status": "running", "started_at": datetime.now()}, "$inc": {"attempts": 1}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def finish_job(job_id: str, status: str, **fields):
+    jobs_collection.update_one(
+        {"_id": job_id},
+        {"$set": {"status": status, "finished_at": datetime.now(), **fields}}
+    )
+
+def requeue_job(job, reason: str):
+    """Put a job back in the queue unless it has used up its attempts"""
+    if job.get("attempts", 0) >= JOB_MAX_ATTEMPTS:
+        finish_job(job["_id"], "failed", reason=reason)
+        return
+    jobs_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "queued", "last_error": reason}}
+    )
+
+def reset_process_pool(broken_pool):
+    """Replace a pool whose worker process died so later jobs can still run"""
+    # Several workers can see the same broken pool; only the first replaces it
+    if app.state.process_pool is broken_pool:
+        app.state.process_pool = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+
+def load_job_file(job):
+    """Fetch and decode the file a job targets, finishing the job if it is gone"""
+    file_doc = files_collection.find_one({"_id": job["file_id"], **NOT_DELETED})
+    if not file_doc:
+        finish_job(job["_id"], "skipped", reason="File not found")
+        return None, None
+    return file_doc, base64.b64decode(file_doc["content"])
+
+def store_optimized_pdf(job, file_doc, content: bytes, optimized: Optional[bytes]):
+    if optimized is None:
+        finish_job(job["_id"], "kept_original", original_size=len(content))
+        return
+
+    # Swap the blob only if the stored file is still the one we optimized
+    result = files_collection.update_one(
+        {"_id": file_doc["_id"], "size": file_doc["size"], "optimized_at": None, **NOT_DELETED},
+        {"$set": {
+            "content": base64.b64encode(optimized).decode('utf-8'),
+            "size": len(optimized),
+            "original_size": len(content),
+            "optimized_at": datetime.now(),
+            # Metadata such as the PDF version describes the old blob
+            "metadata_extracted_at": None,
+            "metadata_job_id": None
+        }}
+    )
+    if result.modified_count == 0:
+        finish_job(job["_id"], "skipped", reason="File changed during optimization")
+        return
+    if PDF_METADATA_ENABLED:
+        queue_metadata_job(file_doc["_id"])
+    finish_job(job["_id"], "done", original_size=len(content), optimized_size=len(optimized))
+
+async def run_optimize_job(job):
+    file_doc, content = await run_in_threadpool(load_job_file, job)
+    if file_doc is None:
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = app.state.process_pool
+    try:
+        optimized = await loop.run_in_executor(pool, optimize_pdf, content)
+    except BrokenProcessPool as e:
+        reset_process_pool(pool)
+        await run_in_threadpool(requeue_job, job, f"Worker process died: {e}")
+        return
+    except Exception as e:
+        await run_in_threadpool(
+            finish_job, job["_id"], "failed", reason=str(e), original_size=len(content)
+        )
+        return
+
+    await run_in_threadpool(store_optimized_pdf, job, file_doc, content, optimized)
+
+def record_unparseable(job, file_doc, reason: str):
+    # Unparseable files will never succeed; record the attempt so the backfill skips them
+    files_collection.update_one(
+        {"_id": file_doc["_id"]},
+        {"$set": {"metadata_extracted_at": datetime.now()}}
+    )
+    finish_job(job["_id"], "failed", reason=reason)
+
+def store_metadata(job, file_doc, metadata, thumbnail: Optional[bytes]):
+    # Only cache a thumbnail for a file that still exists, or the GC would never see it,
+    # and only store metadata if the blob was not swapped by an optimize job meanwhile
+    result = files_collection.update_one(
+        {"_id": file_doc["_id"], "size": file_doc["size"], **NOT_DELETED},
+        {"$set": {**metadata, "has_thumbnail": thumbnail is not None,
+                  "metadata_extracted_at": datetime.now()}}
+    )
+    if result.matched_count == 0:
+        if files_collection.find_one({"_id": file_doc["_id"], **NOT_DELETED}, {"_id": 1}):
+            requeue_job(job, "File changed during extraction")
+        else:
+            finish_job(job["_id"], "skipped", reason="File deleted during extraction")
+        return
+    if thumbnail is not None:
+        thumbnails_collection.replace_one(
+            {"_id": file_doc["_id"]},
+            {"_id": file_doc["_id"], "content": base64.b64encode(thumbnail).decode('utf-8'),
+             "created_at": datetime.now()},
+            upsert=True
+        )
+    finish_job(job["_id"], "done")
+
+async def run_metadata_job(job):
+    file_doc, content = await run_in_threadpool(load_job_file, job)
+    if file_doc is None:
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = app.state.process_pool
+    try:
+        metadata, thumbnail = await loop.run_in_executor(pool, extract_pdf_metadata, content)
+    except BrokenProcessPool as e:
+        reset_process_pool(pool)
+        await run_in_threadpool(requeue_job, job, f"Worker process died: {e}")
+        return
+    except pikepdf.PdfError as e:
+        await run_in_threadpool(record_unparseable, job, file_doc, str(e))
+        return
+    except Exception as e:
+        await run_in_threadpool(requeue_job, job, str(e))
+        return
+
+    await run_in_threadpool(store_metadata, job, file_doc, metadata, thumbnail)
+
+def queue_metadata_job(file_id: str):
+    job_id = enqueue_job("metadata", file_id)
+    files_collection.update_one({"_id": file_id}, {"$set": {"metadata_job_id": job_id}})
+
+def backfill_metadata_batch() -> bool:
+    """Queue one batch of metadata jobs, returning False once nothing is left"""
+    # Only top up the queue once the previous batch has mostly drained
+    queued = jobs_collection.count_documents({"kind": "metadata", "status": "queued"})
+    if queued >= METADATA_BACKFILL_BATCH_SIZE:
+        return True
+    pending = list(files_collection.find(
+        {"metadata_extracted_at": None, "metadata_job_id": None, **NOT_DELETED},
+        {"_id": 1}
+    ).limit(METADATA_BACKFILL_BATCH_SIZE))
+    for file_doc in pending:
+        queue_metadata_job(file_doc["_id"])
+    return bool(pending)
+
+async def metadata_backfill():
+    """Queue metadata extraction for files uploaded before it existed"""
+    while True:
+        try:
+            if not await run_in_threadpool(backfill_metadata_batch):
+                return
+        except Exception:
+            logger.exception("Metadata backfill failed")
+        await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+
+async def job_worker(kind: str, handler):
+    """Poll the job queue and run jobs of one kind"""
+    while True:
+        try:
+            job = await run_in_threadpool(claim_job, kind)
+            if job is None:
+                await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+                continue
+            await handler(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Job worker (%s) failed", kind)
+            await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+
+@app.on_event("startup")
+async def start_job_workers():
+    app.state.job_tasks = []
+    app.state.process_pool = None
+    handlers = {}
+    if PDF_OPTIMIZE_ENABLED:
+        handlers["optimize"] = run_optimize_job
+    if PDF_METADATA_ENABLED:
+        handlers["metadata"] = run_metadata_job
+    if not handlers:
+        return
+    jobs_collection.create_index([("kind", 1), ("status", 1), ("created_at", 1)])
+    # Jobs left running by a previous process will never finish; requeue them
+    jobs_collection.update_many({"status": "running"}, {"$set": {"status": "queued"}})
+    app.state.process_pool = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+    for kind, handler in handlers.items():
+        for _ in range(JOB_WORKERS):
+            app.state.job_tasks.append(asyncio.create_task(job_worker(kind, handler)))
+    if PDF_METADATA_ENABLED:
+        files_collection.create_index("metadata_extracted_at")
+        app.state.job_tasks.append(asyncio.create_task(metadata_backfill()))
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    for task in app.state.job_tasks:
+        task.cancel()
+    if app.state.process_pool is not None:
+        app.state.process_pool.shutdown(wait=False, cancel_futures=True)
 
 # Folder endpoints
 @app.get("/api/folders", response_model=List[Folder])
 async def get_folders():
     """Get all folders"""
     folders = []
-    for folder in folders_collection.find():
+    for folder in folders_collection.find(NOT_DELETED):
         folders.append(Folder(
             id=folder["_id"],
             name=folder["name"],
@@ -68,6 +587,9 @@ async def get_folders():
 @app.post("/api/folders", response_model=Folder)
 async def create_folder(folder: FolderCreate):
     """Create a new folder"""
+    if parent_folder_missing(folder.parent_id):
+        raise HTTPException(status_code=404, detail="Parent folder not found")
+    
     folder_id = str(uuid.uuid4())
     folder_data = {
         "_id": folder_id,
@@ -87,7 +609,7 @@ async def create_folder(folder: FolderCreate):
 async def update_folder(folder_id: str, folder_update: FolderUpdate):
     """Rename a folder"""
     result = folders_collection.update_one(
-        {"_id": folder_id},
+        {"_id": folder_id, **NOT_DELETED},
         {"$set": {"name": folder_update.name}}
     )
     if result.matched_count == 0:
@@ -103,39 +625,92 @@ async def update_folder(folder_id: str, folder_update: FolderUpdate):
 
 @app.delete("/api/folders/{folder_id}")
 async def delete_folder(folder_id: str):
-    """Delete a folder and all its contents"""
-    # Delete all files in this folder
-    files_collection.delete_many({"folder_id": folder_id})
-    
-    # Delete all subfolders (simple approach - could be made recursive)
-    folders_collection.delete_many({"parent_id": folder_id})
-    
+    """Delete a folder and all its contents
+
+    Items are only tombstoned here; the garbage collector reclaims them
+    after the retention window, until which they can be restored.
+    """
+    tombstone = {"$set": {"deleted_at": datetime.now(), "deleted_with": folder_id}}
+
     # Delete the folder itself
-    result = folders_collection.delete_one({"_id": folder_id})
-    if result.deleted_count == 0:
+    result = folders_collection.update_one({"_id": folder_id, **NOT_DELETED}, tombstone)
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Folder not found")
-    
+
+    # Delete all subfolders (simple approach - could be made recursive)
+    folders_collection.update_many({"parent_id": folder_id, **NOT_DELETED}, tombstone)
+
+    # Delete all files in this folder
+    files_collection.update_many({"folder_id": folder_id, **NOT_DELETED}, tombstone)
+    unindex_files(files_collection.distinct("_id", {"folder_id": folder_id, "deleted_with": folder_id}))
+
     return {"message": "Folder deleted successfully"}
 
+@app.post("/api/folders/{folder_id}/restore", response_model=Folder)
+async def restore_folder(folder_id: str):
+    """Restore a deleted folder and everything deleted along with it"""
+    folder = folders_collection.find_one({"_id": folder_id, "deleted_at": {"$ne": None}})
+    if not folder:
+        raise HTTPException(status_code=404, detail="Deleted folder not found")
+    if parent_folder_missing(folder.get("parent_id")):
+        raise HTTPException(status_code=409, detail="Parent folder is deleted, restore it first")
+
+    restore = {"$set": {"deleted_at": None, "deleted_with": None}}
+    result = folders_collection.update_one({"_id": folder_id, "deleted_at": {"$ne": None}}, restore)
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Deleted folder not found")
+
+    restored_files = list(files_collection.find({"deleted_with": folder_id}, {"name": 1, "folder_id": 1}))
+    folders_collection.update_many({"deleted_with": folder_id}, restore)
+    files_collection.update_many({"deleted_with": folder_id}, restore)
+    for file_doc in restored_files:
+        index_file(file_doc)
+
+    folder = folders_collection.find_one({"_id": folder_id})
+    return Folder(
+        id=folder["_id"],
+        name=folder["name"],
+        parent_id=folder.get("parent_id"),
+        created_at=folder["created_at"]
+    )
+
 # File endpoints
 @app.get("/api/files", response_model=List[FileInfo])
 async def get_files(folder_id: Optional[str] = None):
     """Get all files, optionally filtered by folder"""
-    query = {}
+    query = dict(NOT_DELETED)
     if folder_id is not None:
         query["folder_id"] = folder_id
     
     files = []
     for file_doc in files_collection.find(query, {"content": 0}):  # Exclude content for listing
-        files.append(FileInfo(
-            id=file_doc["_id"],
-            name=file_doc["name"],
-            folder_id=file_doc.get("folder_id"),
-            size=file_doc["size"],
-            uploaded_at=file_doc["uploaded_at"]
-        ))
+        files.append(file_info(file_doc))
     return files
 
+@app.get("/api/files/search", response_model=List[FileInfo])
+async def search_files(
+    name: str = Query(..., min_length=1),
+    folder_id: Optional[str] = None,
+    match: str = Query("prefix", pattern="^(prefix|substring)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Search files by name across the whole library, optionally within a folder"""
+    normalized = normalize_name(name)
+    if not normalized:
+        raise HTTPException(status_code=400, detail="Search name must not be blank")
+    
+    query, hint = build_search_query(normalized, folder_id, match)
+    cursor = search_collection.find(query, {"_id": 1}).sort([("name_lower", 1), ("_id", 1)])
+    if hint is not None:
+        cursor = cursor.hint(hint)
+    file_ids = [entry["_id"] for entry in cursor.skip(offset).limit(limit)]
+    file_docs = {
+        file_doc["_id"]: file_doc
+        for file_doc in files_collection.find({"_id": {"$in": file_ids}, **NOT_DELETED}, {"content": 0})
+    }
+    return [file_info(file_docs[file_id]) for file_id in file_ids if file_id in file_docs]
+
 @app.post("/api/files/upload", response_model=FileInfo)
 async def upload_file(
     file: UploadFile = File(...),
@@ -146,6 +721,9 @@ async def upload_file(
     if not file.content_type == "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
+    if parent_folder_missing(folder_id):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    
     # Read file content
     content = await file.read()
     
@@ -159,18 +737,19 @@ async def upload_file(
         "folder_id": folder_id,
         "content": base64_content,
         "size": len(content),
-        "uploaded_at": datetime.now()
+        "uploaded_at": datetime.now(),
+        "search_indexed": True
     }
     
     files_collection.insert_one(file_data)
+    index_file(file_data)
     
-    return FileInfo(
-        id=file_id,
-        name=file.filename,
-        folder_id=folder_id,
-        size=len(content),
-        uploaded_at=file_data["uploaded_at"]
-    )
+    if PDF_OPTIMIZE_ENABLED:
+        enqueue_job("optimize", file_id)
+    if PDF_METADATA_ENABLED:
+        queue_metadata_job(file_id)
+    
+    return file_info(file_data)
 
 @app.put("/api/files/{file_id}", response_model=FileInfo)
 async def update_file(file_id: str, file_update: FileUpdate):
@@ -184,8 +763,11 @@ async def update_file(file_id: str, file_update: FileUpdate):
     if not update_data:
         raise HTTPException(status_code=400, detail="No update data provided")
     
+    if parent_folder_missing(file_update.folder_id):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    
     result = files_collection.update_one(
-        {"_id": file_id},
+        {"_id": file_id, **NOT_DELETED},
         {"$set": update_data}
     )
     
@@ -193,18 +775,13 @@ async def update_file(file_id: str, file_update: FileUpdate):
         raise HTTPException(status_code=404, detail="File not found")
     
     file_doc = files_collection.find_one({"_id": file_id}, {"content": 0})
-    return FileInfo(
-        id=file_doc["_id"],
-        name=file_doc["name"],
-        folder_id=file_doc.get("folder_id"),
-        size=file_doc["size"],
-        uploaded_at=file_doc["uploaded_at"]
-    )
+    index_file(file_doc)
+    return file_info(file_doc)
 
 @app.get("/api/files/{file_id}/download")
 async def download_file(file_id: str):
     """Download a PDF file"""
-    file_doc = files_collection.find_one({"_id": file_id})
+    file_doc = files_collection.find_one({"_id": file_id, **NOT_DELETED})
     if not file_doc:
         raise HTTPException(status_code=404, detail="File not found")
     
@@ -217,15 +794,79 @@ async def download_file(file_id: str):
         headers={"Content-Disposition": f"attachment; filename={file_doc['name']}"}
     )
 
+@app.get("/api/files/{file_id}/thumbnail")
+async def get_thumbnail(file_id: str, request: Request):
+    """Get the cached first-page thumbnail of a file"""
+    if not files_collection.find_one({"_id": file_id, **NOT_DELETED}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="File not found")
+    thumbnail = thumbnails_collection.find_one({"_id": file_id})
+    if not thumbnail:
+        raise HTTPException(status_code=404, detail="Thumbnail not available")
+    
+    etag = f'"{file_id}-{int(thumbnail["created_at"].timestamp())}"'
+    headers = {"Cache-Control": "public, max-age=86400", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(
+        content=base64.b64decode(thumbnail["content"]),
+        media_type="image/jpeg",
+        headers=headers
+    )
+
 @app.delete("/api/files/{file_id}")
 async def delete_file(file_id: str):
-    """Delete a file"""
-    result = files_collection.delete_one({"_id": file_id})
-    if result.deleted_count == 0:
+    """Delete a file (tombstoned until the garbage collector reclaims it)"""
+    result = files_collection.update_one(
+        {"_id": file_id, **NOT_DELETED},
+        {"$set": {"deleted_at": datetime.now(), "deleted_with": file_id}}
+    )
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="File not found")
     
+    unindex_files([file_id])
     return {"message": "File deleted successfully"}
 
+@app.post("/api/files/{file_id}/restore", response_model=FileInfo)
+async def restore_file(file_id: str):
+    """Restore a deleted file that has not been garbage collected yet"""
+    file_doc = files_collection.find_one({"_id": file_id, "deleted_at": {"$ne": None}}, {"folder_id": 1})
+    if not file_doc:
+        raise HTTPException(status_code=404, detail="Deleted file not found")
+    if parent_folder_missing(file_doc.get("folder_id")):
+        raise HTTPException(status_code=409, detail="Parent folder is deleted, restore it first")
+
+    result = files_collection.update_one(
+        {"_id": file_id, "deleted_at": {"$ne": None}},
+        {"$set": {"deleted_at": None, "deleted_with": None}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Deleted file not found")
+
+    file_doc = files_collection.find_one({"_id": file_id}, {"content": 0})
+    index_file(file_doc)
+    return file_info(file_doc)
+
+@app.post("/api/files/{file_id}/optimize")
+async def optimize_file(file_id: str):
+    """Queue a background linearization/recompression job for a file"""
+    if not PDF_OPTIMIZE_ENABLED:
+        raise HTTPException(status_code=503, detail="PDF optimization is disabled")
+    if not files_collection.find_one({"_id": file_id, **NOT_DELETED}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return {"job_id": enqueue_job("optimize", file_id)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status of a background job"""
+    job = jobs_collection.find_one({"_id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job["id"] = job.pop("_id")
+    return job
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
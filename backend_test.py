@@ -9,9 +9,11 @@ import json
 import base64
 import os
 import tempfile
+import time
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
+from reportlab.lib.pdfencrypt import StandardEncryption
 
 # Backend URL from environment
 BACKEND_URL = "https://66688753-baee-43b6-a49b-f7d910a2636f.preview.emergentagent.com/api"
@@ -34,6 +36,48 @@ class PDFTestManager:
         buffer.seek(0)
         return buffer.getvalue()
     
+    def create_encrypted_pdf(self, content="Protected PDF Content"):
+        """Create a PDF with only an owner password (printing disallowed)"""
+        buffer = BytesIO()
+        encryption = StandardEncryption("", ownerPassword="owner-secret", canPrint=0)
+        p = canvas.Canvas(buffer, pagesize=letter, encrypt=encryption)
+        p.drawString(100, 750, content)
+        p.showPage()
+        p.save()
+        return buffer.getvalue()
+    
+    def create_titled_pdf(self, title, author, pages=2):
+        """Create a multi-page PDF with document info set"""
+        buffer = BytesIO()
+        p = canvas.Canvas(buffer, pagesize=letter)
+        p.setTitle(title)
+        p.setAuthor(author)
+        for page in range(pages):
+            p.drawString(100, 750, f"Page {page + 1}")
+            p.showPage()
+        p.save()
+        return buffer.getvalue()
+    
+    def wait_for_metadata(self, file_id, timeout=60):
+        """Poll the file listing until background metadata extraction has run"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for file_info in self.session.get(f"{BACKEND_URL}/files").json():
+                if file_info["id"] == file_id and file_info["encrypted"] is not None:
+                    return file_info
+            time.sleep(1)
+        return None
+    
+    def wait_for_job(self, job_id, timeout=60):
+        """Poll a background job until it leaves the queue"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.session.get(f"{BACKEND_URL}/jobs/{job_id}").json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            time.sleep(1)
+        return None
+    
     def test_health_check(self):
         """Test if backend is running"""
         print("🔍 Testing health check...")
@@ -411,6 +455,324 @@ class PDFTestManager:
         
         return True
     
+    def upload_test_pdf(self, filename, folder_id=None, content=None):
+        """Upload a generated PDF and track it for cleanup"""
+        pdf_content = content if content is not None else self.create_test_pdf(filename, filename)
+        files = {"file": (filename, pdf_content, "application/pdf")}
+        data = {"folder_id": folder_id} if folder_id else None
+        response = self.session.post(f"{BACKEND_URL}/files/upload", files=files, data=data)
+        if response.status_code != 200:
+            print(f"❌ Failed to upload {filename}: {response.status_code} - {response.text}")
+            return None
+        uploaded_file = response.json()
+        self.created_files.append(uploaded_file["id"])
+        return uploaded_file
+    
+    def test_soft_delete_and_restore(self):
+        """Test that deletes hide items immediately and restore brings them back"""
+        print("\n♻️ Testing Soft Delete and Restore...")
+        
+        folder_response = self.session.post(f"{BACKEND_URL}/folders", json={"name": "Restorable", "parent_id": None})
+        subfolder_response = self.session.post(
+            f"{BACKEND_URL}/folders", json={"name": "Restorable Child", "parent_id": folder_response.json()["id"]}
+        )
+        if folder_response.status_code != 200 or subfolder_response.status_code != 200:
+            print("❌ Failed to create folders for restore tests")
+            return False
+        folder = folder_response.json()
+        subfolder = subfolder_response.json()
+        self.created_folders.extend([folder["id"], subfolder["id"]])
+        
+        test_file = self.upload_test_pdf("restorable.pdf", folder["id"])
+        if not test_file:
+            return False
+        
+        # Test 1: Deleted file disappears from listings and downloads
+        print("1. Deleting file and checking listings...")
+        self.session.delete(f"{BACKEND_URL}/files/{test_file['id']}")
+        listed_ids = [f["id"] for f in self.session.get(f"{BACKEND_URL}/files?folder_id={folder['id']}").json()]
+        if test_file["id"] in listed_ids:
+            print("❌ Deleted file still listed")
+            return False
+        if self.session.get(f"{BACKEND_URL}/files/{test_file['id']}/download").status_code != 404:
+            print("❌ Deleted file still downloadable")
+            return False
+        print("✅ Deleted file hidden")
+        
+        # Test 2: Restoring the file brings it back
+        print("2. Restoring file...")
+        response = self.session.post(f"{BACKEND_URL}/files/{test_file['id']}/restore")
+        listed_ids = [f["id"] for f in self.session.get(f"{BACKEND_URL}/files?folder_id={folder['id']}").json()]
+        if response.status_code != 200 or test_file["id"] not in listed_ids:
+            print(f"❌ Failed to restore file: {response.status_code} - {response.text}")
+            return False
+        print("✅ File restored")
+        
+        # Test 3: Deleting a folder hides the folder, its subfolders and files
+        print("3. Deleting folder...")
+        self.session.delete(f"{BACKEND_URL}/folders/{folder['id']}")
+        folder_ids = [f["id"] for f in self.session.get(f"{BACKEND_URL}/folders").json()]
+        if folder["id"] in folder_ids or subfolder["id"] in folder_ids:
+            print("❌ Deleted folders still listed")
+            return False
+        if self.session.get(f"{BACKEND_URL}/files/{test_file['id']}/download").status_code != 404:
+            print("❌ File in deleted folder still downloadable")
+            return False
+        print("✅ Folder contents hidden")
+        
+        # Test 4: Nothing new can be placed in a deleted folder
+        print("4. Targeting a deleted folder...")
+        files = {"file": ("late.pdf", self.create_test_pdf("late.pdf"), "application/pdf")}
+        upload = self.session.post(f"{BACKEND_URL}/files/upload", files=files, data={"folder_id": folder["id"]})
+        create = self.session.post(f"{BACKEND_URL}/folders", json={"name": "Late", "parent_id": folder["id"]})
+        live_file = self.upload_test_pdf("live.pdf")
+        if not live_file:
+            return False
+        move = self.session.put(f"{BACKEND_URL}/files/{live_file['id']}", json={"folder_id": folder["id"]})
+        if upload.status_code != 404 or create.status_code != 404 or move.status_code != 404:
+            print(f"❌ Expected 404, got {upload.status_code}, {create.status_code} and {move.status_code}")
+            return False
+        print("✅ Uploads, creates and moves into deleted folders rejected")
+        
+        # Test 4b: Children cannot be restored while their parent is deleted
+        print("4. Restoring children of a deleted folder...")
+        file_restore = self.session.post(f"{BACKEND_URL}/files/{test_file['id']}/restore")
+        subfolder_restore = self.session.post(f"{BACKEND_URL}/folders/{subfolder['id']}/restore")
+        if file_restore.status_code != 409 or subfolder_restore.status_code != 409:
+            print(f"❌ Expected 409, got {file_restore.status_code} and {subfolder_restore.status_code}")
+            return False
+        print("✅ Orphaning restores rejected")
+        
+        # Test 5: Restoring the folder brings back everything deleted with it
+        print("5. Restoring folder...")
+        response = self.session.post(f"{BACKEND_URL}/folders/{folder['id']}/restore")
+        folder_ids = [f["id"] for f in self.session.get(f"{BACKEND_URL}/folders").json()]
+        download = self.session.get(f"{BACKEND_URL}/files/{test_file['id']}/download")
+        if response.status_code != 200 or subfolder["id"] not in folder_ids or download.status_code != 200:
+            print(f"❌ Folder restore incomplete: {response.status_code} - {response.text}")
+            return False
+        print("✅ Folder, subfolder and file restored")
+        
+        # Test 6: Restoring something that is not deleted is a 404
+        print("6. Restoring a live file...")
+        if self.session.post(f"{BACKEND_URL}/files/{test_file['id']}/restore").status_code != 404:
+            print("❌ Expected 404 when restoring a file that is not deleted")
+            return False
+        print("✅ Proper error handling for live file restore")
+        
+        return True
+    
+    def test_pdf_optimization(self):
+        """Test that optimization only ever swaps in a smaller, equivalent PDF"""
+        print("\n🗜️ Testing PDF Optimization Jobs...")
+        
+        # Test 1: Encrypted PDFs keep their original bytes
+        print("1. Optimizing an owner-password protected PDF...")
+        original = self.create_encrypted_pdf()
+        protected_file = self.upload_test_pdf("protected.pdf", content=original)
+        if not protected_file:
+            return False
+        
+        response = self.session.post(f"{BACKEND_URL}/files/{protected_file['id']}/optimize")
+        if response.status_code == 503:
+            print("⚠️ PDF optimization disabled on this backend, skipping")
+            return True
+        if response.status_code != 200:
+            print(f"❌ Failed to queue optimization: {response.status_code} - {response.text}")
+            return False
+        
+        job = self.wait_for_job(response.json()["job_id"])
+        stored = self.session.get(f"{BACKEND_URL}/files/{protected_file['id']}/download").content
+        if not job or job["status"] != "kept_original" or stored != original:
+            print(f"❌ Encrypted PDF was rewritten: {job}")
+            return False
+        print("✅ Encrypted PDF kept as uploaded")
+        
+        # Test 2: A job either keeps the original or swaps in something smaller
+        print("2. Optimizing a regular PDF...")
+        original = self.create_test_pdf("optimizable.pdf", "Optimizable Content " * 20)
+        test_file = self.upload_test_pdf("optimizable.pdf", content=original)
+        if not test_file:
+            return False
+        
+        response = self.session.post(f"{BACKEND_URL}/files/{test_file['id']}/optimize")
+        job = self.wait_for_job(response.json()["job_id"])
+        stored = self.session.get(f"{BACKEND_URL}/files/{test_file['id']}/download").content
+        if not job:
+            print("❌ Optimization job did not finish")
+            return False
+        if job["status"] == "kept_original" and stored != original:
+            print("❌ Job kept the original but the stored blob changed")
+            return False
+        if job["status"] == "done" and not (
+            job["optimized_size"] < job["original_size"] and len(stored) == job["optimized_size"]
+            and stored.startswith(b"%PDF")
+        ):
+            print(f"❌ Optimized blob is not a smaller PDF: {job}")
+            return False
+        print(f"✅ Optimization job finished: {job['status']}")
+        
+        # Test 3: Metadata follows the blob that is actually served
+        if job["status"] == "done":
+            print("3. Checking metadata of the optimized blob...")
+            served_version = stored[5:8].decode()
+            deadline = time.time() + 60
+            file_info = None
+            while time.time() < deadline:
+                file_info = next(
+                    (f for f in self.session.get(f"{BACKEND_URL}/files").json() if f["id"] == test_file["id"]), None
+                )
+                if file_info is None or file_info["pdf_version"] == served_version:
+                    break
+                time.sleep(1)
+            if file_info and file_info["pdf_version"] not in (None, served_version):
+                print(f"❌ Metadata says PDF {file_info['pdf_version']} but {served_version} is served")
+                return False
+            print("✅ Metadata matches the optimized blob")
+        
+        return True
+    
+    def test_metadata_extraction(self):
+        """Test upload-time metadata extraction and the thumbnail endpoint"""
+        print("\n🔎 Testing Metadata Extraction...")
+        
+        # Test 1: Page count, title and author are stored on the file
+        print("1. Uploading a titled PDF...")
+        content = self.create_titled_pdf("Attention Is All You Need", "Vaswani", pages=2)
+        test_file = self.upload_test_pdf("attention.pdf", content=content)
+        if not test_file:
+            return False
+        
+        file_info = self.wait_for_metadata(test_file["id"])
+        if file_info is None:
+            print("⚠️ Metadata extraction disabled on this backend, skipping")
+            return True
+        if (file_info["page_count"] != 2 or file_info["title"] != "Attention Is All You Need"
+                or file_info["author"] != "Vaswani" or file_info["encrypted"]):
+            print(f"❌ Unexpected metadata: {file_info}")
+            return False
+        print(f"✅ Metadata extracted: {file_info['page_count']} pages, PDF {file_info['pdf_version']}")
+        
+        # Test 2: Thumbnail is served as a cacheable JPEG
+        print("2. Fetching thumbnail...")
+        response = self.session.get(f"{BACKEND_URL}/files/{test_file['id']}/thumbnail")
+        if not file_info["has_thumbnail"]:
+            if response.status_code != 404:
+                print(f"❌ Expected 404 without a thumbnail, got: {response.status_code}")
+                return False
+            print("⚠️ Thumbnail rendering unavailable on this backend")
+        else:
+            etag = response.headers.get("etag")
+            if response.status_code != 200 or response.headers.get("content-type") != "image/jpeg" or not etag:
+                print(f"❌ Bad thumbnail response: {response.status_code} {response.headers}")
+                return False
+            cached = self.session.get(
+                f"{BACKEND_URL}/files/{test_file['id']}/thumbnail", headers={"If-None-Match": etag}
+            )
+            if cached.status_code != 304:
+                print(f"❌ Expected 304 for matching ETag, got: {cached.status_code}")
+                return False
+            print("✅ Thumbnail served with working ETag")
+        
+        # Test 3: Encryption status is recorded
+        print("3. Uploading an encrypted PDF...")
+        protected_file = self.upload_test_pdf("protected_metadata.pdf", content=self.create_encrypted_pdf())
+        if not protected_file:
+            return False
+        file_info = self.wait_for_metadata(protected_file["id"])
+        if file_info is None or not file_info["encrypted"]:
+            print(f"❌ Encrypted PDF not flagged: {file_info}")
+            return False
+        print("✅ Encrypted PDF flagged")
+        
+        return True
+    
+    def search_ids(self, **params):
+        response = self.session.get(f"{BACKEND_URL}/files/search", params=params)
+        if response.status_code != 200:
+            print(f"❌ Search failed: {response.status_code} - {response.text}")
+            return None
+        return [f["id"] for f in response.json()]
+    
+    def test_file_search(self):
+        """Test name search, scoping, pagination and index maintenance"""
+        print("\n🔍 Testing File Search...")
+        
+        folder_response = self.session.post(f"{BACKEND_URL}/folders", json={"name": "Search Scope", "parent_id": None})
+        if folder_response.status_code != 200:
+            print("❌ Failed to create folder for search tests")
+            return False
+        folder = folder_response.json()
+        self.created_folders.append(folder["id"])
+        
+        # Unique token so results are not affected by other files in the library
+        token = f"zq{int(time.time())}"
+        uploaded = []
+        for i in range(3):
+            test_file = self.upload_test_pdf(f"{token} Survey {i}.pdf", folder["id"] if i < 2 else None)
+            if not test_file:
+                return False
+            uploaded.append(test_file["id"])
+        
+        # Test 1: Prefix typeahead is case-insensitive
+        print("1. Prefix search...")
+        ids = self.search_ids(name=token.upper())
+        if ids is None or sorted(ids) != sorted(uploaded):
+            print(f"❌ Prefix search returned {ids}")
+            return False
+        print("✅ Prefix search found all files")
+        
+        # Test 2: Substring match and folder scoping
+        print("2. Substring search scoped to a folder...")
+        ids = self.search_ids(name="survey 1", match="substring", folder_id=folder["id"])
+        if ids != [uploaded[1]]:
+            print(f"❌ Scoped substring search returned {ids}")
+            return False
+        print("✅ Scoped substring search works")
+        
+        # Test 3: Pagination returns disjoint pages in name order
+        print("3. Paginating results...")
+        first = self.search_ids(name=token, limit=2, offset=0)
+        second = self.search_ids(name=token, limit=2, offset=2)
+        if first != uploaded[:2] or second != uploaded[2:]:
+            print(f"❌ Unexpected pages: {first} / {second}")
+            return False
+        print("✅ Pagination works")
+        
+        # Test 4: Blank names are rejected and short substrings act as typeahead
+        print("4. Searching with blank and short names...")
+        blank = self.session.get(f"{BACKEND_URL}/files/search", params={"name": "   "})
+        short = self.search_ids(name=token[:2], match="substring", folder_id=folder["id"])
+        if blank.status_code != 400 or short is None or uploaded[0] not in short:
+            print(f"❌ Blank search returned {blank.status_code}, short search returned {short}")
+            return False
+        print("✅ Blank and short searches handled")
+        
+        # Test 5: Renames and moves update the index
+        print("5. Renaming and moving a file...")
+        self.session.put(f"{BACKEND_URL}/files/{uploaded[0]}", json={"name": f"{token} Renamed.pdf"})
+        self.session.put(f"{BACKEND_URL}/files/{uploaded[2]}", json={"folder_id": folder["id"]})
+        if (self.search_ids(name=f"{token} survey 0") != []
+                or self.search_ids(name=f"{token} renamed") != [uploaded[0]]
+                or uploaded[2] not in self.search_ids(name=token, folder_id=folder["id"])):
+            print("❌ Search index not updated after rename/move")
+            return False
+        print("✅ Rename and move reflected in search")
+        
+        # Test 6: Deleted files drop out of search and come back on restore
+        print("6. Deleting and restoring a file...")
+        self.session.delete(f"{BACKEND_URL}/files/{uploaded[1]}")
+        if uploaded[1] in self.search_ids(name=token):
+            print("❌ Deleted file still returned by search")
+            return False
+        self.session.post(f"{BACKEND_URL}/files/{uploaded[1]}/restore")
+        if uploaded[1] not in self.search_ids(name=token):
+            print("❌ Restored file missing from search")
+            return False
+        print("✅ Search follows delete and restore")
+        
+        return True
+    
     def cleanup(self):
         """Clean up created test data"""
         print("\n🧹 Cleaning up test data...")
@@ -467,6 +829,18 @@ class PDFTestManager:
         # Test 7: File Deletion
         test_results["file_deletion"] = self.test_file_deletion()
         
+        # Test 8: Soft Delete and Restore
+        test_results["soft_delete_restore"] = self.test_soft_delete_and_restore()
+        
+        # Test 9: PDF Optimization
+        test_results["pdf_optimization"] = self.test_pdf_optimization()
+        
+        # Test 10: Metadata Extraction
+        test_results["metadata_extraction"] = self.test_metadata_extraction()
+        
+        # Test 11: File Search
+        test_results["file_search"] = self.test_file_search()
+        
         # Cleanup
         self.cleanup()
         
@@ -0,0 +1,91 @@
+"""
+Explain-based checks for the file-name search index.
+
+These run against a real MongoDB (MONGO_URL, default localhost) using a
+scratch database, and are skipped when the backend dependencies or the
+server are not available.
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pymongo = pytest.importorskip("pymongo")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+import server  # noqa: E402
+
+
+@pytest.fixture()
+def search_collection(monkeypatch):
+    client = pymongo.MongoClient(os.environ.get("MONGO_URL"), serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip("MongoDB is not reachable")
+
+    collection = client.pdf_management_test.file_search
+    collection.drop()
+    collection.create_index([("name_lower", 1), ("_id", 1)])
+    collection.create_index([("folder_id", 1), ("name_lower", 1), ("_id", 1)])
+    collection.create_index("grams")
+
+    # A library where almost every name shares ".pdf", "report" and a year
+    docs = [
+        {"_id": f"file-{i}", "name": f"Report {2000 + i % 25}.pdf", "folder_id": f"folder-{i % 10}"}
+        for i in range(5000)
+    ]
+    docs.append({"_id": "zebra", "name": "Quarterly Zebra Report.pdf", "folder_id": "folder-1"})
+    collection.insert_many([server.search_entry(doc) for doc in docs])
+
+    monkeypatch.setattr(server, "search_collection", collection)
+    yield collection
+    collection.drop()
+
+
+def explain(collection, normalized, folder_id=None, match="substring"):
+    query, hint = server.build_search_query(normalized, folder_id, match)
+    cursor = collection.find(query, {"_id": 1}).sort([("name_lower", 1), ("_id", 1)]).limit(20)
+    if hint is not None:
+        cursor = cursor.hint(hint)
+    return cursor.explain()["executionStats"]
+
+
+def test_substring_uses_most_selective_gram(search_collection):
+    stats = explain(search_collection, "zebra report.pdf")
+    assert stats["nReturned"] == 1
+    assert stats["totalKeysExamined"] <= 5
+
+
+def test_substring_skips_punctuation_grams(search_collection):
+    assert server.most_selective_gram("zebra report.pdf")[0] in server.name_ngrams("zebra")
+
+
+def test_prefix_scans_only_matching_keys(search_collection):
+    stats = explain(search_collection, "quarterly", match="prefix")
+    assert stats["nReturned"] == 1
+    assert stats["totalKeysExamined"] <= 5
+
+
+def test_folder_scoped_prefix(search_collection):
+    stats = explain(search_collection, "quarterly", folder_id="folder-2", match="prefix")
+    assert stats["nReturned"] == 0
+    assert stats["totalKeysExamined"] <= 5
+
+
+def test_probes_are_capped_and_spread():
+    normalized = server.normalize_name("A Very Long Annual Financial Statement Summary 2024.pdf")
+    grams = server.probe_grams(normalized)
+    assert len(grams) == server.SEARCH_MAX_GRAM_PROBES
+    assert all(gram.isalnum() for gram in grams)
+    # The first and last alphanumeric grams bracket the query
+    assert grams[0] == "ver"
+    assert grams[-1] == "pdf"
+
+
+def test_short_substring_falls_back_to_prefix():
+    query, hint = server.build_search_query("qu", None, "substring")
+    assert query == {"name_lower": {"$regex": "^qu"}}
+    assert hint is None